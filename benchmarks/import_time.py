@@ -0,0 +1,77 @@
+"""
+Đo thời gian import của iqdb_api bằng `python -X importtime`.
+
+Mỗi kịch bản được chạy trong một tiến trình Python mới. Script thất bại (exit code 1)
+nếu một module nặng bị import khi không cần, hoặc nếu thời gian import vượt ngưỡng.
+
+Cách dùng:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --max-ms 50 --repeat 5
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import List, Set, Tuple
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+HEAVY_MODULES = ("httpx", "PIL", "bs4", "lxml")
+
+# (tên, câu lệnh, các module nặng được phép import)
+SCENARIOS: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ("package", "import iqdb_api", ()),
+    ("models", "from iqdb_api import SearchResult, Match, Source, Rating", ()),
+    ("exceptions", "from iqdb_api import IqdbApiException", ()),
+    ("cli", "import iqdb_api.cli", ()),
+    ("client", "from iqdb_api import IqdbClient", ("httpx",)),
+]
+
+_LINE_REGEX = re.compile(r'^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)')
+
+
+def _run_importtime(statement: str) -> List[Tuple[int, int, str]]:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SRC_DIR, os.environ.get("PYTHONPATH")])))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if match := _LINE_REGEX.match(line):
+            rows.append((len(match.group(3)), int(match.group(2)), match.group(4)))
+    return rows
+
+
+def measure(statement: str, baseline: Set[str]) -> Tuple[int, Set[str]]:
+    """
+    Trả về (thời gian import tích lũy tính bằng µs, các module cấp cao nhất đã được import).
+
+    Chỉ cộng các import ở cấp ngoài cùng không có trong lần chạy cơ sở (`pass`),
+    tức là phần do câu lệnh cần đo gây ra.
+    """
+    rows = _run_importtime(statement)
+    root_indent = min(indent for indent, _, _ in rows)
+    total = sum(cumulative for indent, cumulative, name in rows if indent == root_indent and name not in baseline)
+    return total, {name.split(".")[0] for _, _, name in rows}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-ms", type=float, default=None, help="Ngưỡng thời gian import (ms) cho các kịch bản không dùng client.")
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần đo cho mỗi kịch bản; lấy giá trị nhỏ nhất.")
+    args = parser.parse_args()
+
+    baseline = {name for _, _, name in _run_importtime("pass")}
+    failed = False
+    for name, statement, allowed in SCENARIOS:
+        runs = [measure(statement, baseline) for _ in range(max(1, args.repeat))]
+        total, modules = min(runs, key=lambda r: r[0])
+        heavy = sorted(m for m in HEAVY_MODULES if m in modules and m not in allowed)
+        too_slow = args.max_ms is not None and not allowed and total / 1000 > args.max_ms
+        status = "FAIL" if heavy or too_slow else "ok"
+        failed = failed or status == "FAIL"
+        extra = f"  (import không mong muốn: {', '.join(heavy)})" if heavy else ""
+        print(f"{status:4}  {name:<12} {total / 1000:8.2f} ms  {statement}{extra}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Đo throughput end-to-end của IqdbClient bằng cách phát lại một cassette, không cần mạng.
+
+Toàn bộ pipeline được chạy thật (thử lại khi gặp "Can't read query result", lấy
+trang "more results", parse HTML), nhưng giới hạn tốc độ và thời gian chờ dùng
+`VirtualClock` nên chạy hết trong vài giây.
+
+Không truyền `--cassette` thì script tự tạo một cassette tổng hợp: mỗi ảnh gặp lỗi
+có thể thử lại ở lần đầu, sau đó trả về kết quả kèm link "Give me more!".
+
+Cách dùng:
+    python benchmarks/replay_throughput.py --images 200 --rounds 3
+    python benchmarks/replay_throughput.py --cassette recorded.json.gz --files a.jpg b.jpg
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import httpx
+from PIL import Image
+
+from iqdb_api import CassetteTransport, IqdbClient, VirtualClock
+
+_RESULT_HTML = """<html><body><div id="pages">
+<div><table><tr><th>Your image</th></tr><tr><td><img src="/thu/{n}.jpg"></td></tr><tr><td>500×500 JPEG</td></tr></table></div>
+<div><table><tr><th>Best match</th></tr><tr><td><a href="//danbooru.donmai.us/posts/{n}"><img src="/danbooru/{n}.jpg" alt="Rating: s Score: 10 Tags: a b c"></a></td></tr>
+<tr><td>Danbooru</td></tr><tr><td>1200×800 [Safe]</td></tr><tr><td>95% similarity</td></tr></table></div>
+<div><table><tr><th>Possible match</th></tr><tr><td><a href="https://yande.re/post/show/{n}"><img src="/yandere/{n}.jpg" alt="Score: 2 Tags: d"></a></td></tr>
+<tr><td>yande.re</td></tr><tr><td>1000×700 [Ero]</td></tr><tr><td>71% similarity</td></tr></table></div>
+</div>{more}<p>Searched 31,234,567 images in 2.103 seconds.</p></body></html>"""
+_RETRY_HTML = "<html><body><div class='err'>Can't read query result!</div></body></html>"
+
+
+def make_images(count: int) -> List[bytes]:
+    images = []
+    for i in range(count):
+        with BytesIO() as out:
+            Image.new("RGB", (64, 64), (i % 256, (i // 256) % 256, 128)).save(out, format="PNG")
+            images.append(out.getvalue())
+    return images
+
+
+async def record_synthetic(path: str, images: List[bytes]):
+    """Ghi một cassette tổng hợp bằng cách chạy client thật trên một server giả trong bộ nhớ."""
+    attempts: Dict[bytes, int] = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if "more" in request.url.params:
+            n = request.url.params["more"]
+            return httpx.Response(200, html=_RESULT_HTML.format(n=n, more=""))
+        body = request.read()
+        n = next(i for i, data in enumerate(images) if data in body)
+        attempts[images[n]] = attempts.get(images[n], 0) + 1
+        if attempts[images[n]] == 1: return httpx.Response(200, html=_RETRY_HTML)
+        return httpx.Response(200, html=_RESULT_HTML.format(n=n, more=f'<a id="yetmore" href="/?more={n}">Give me more!</a>'))
+
+    clock = VirtualClock()
+    transport = CassetteTransport(path, mode="record", transport=httpx.MockTransport(handler))
+    async with IqdbClient(base_url="https://iqdb.test", transport=transport, clock=clock, include_more_results=True) as client:
+        for data in images: await client.search_file(data)
+
+
+async def replay(path: str, images: List[bytes], rounds: int, latency: float, concurrency: int) -> Dict[str, float]:
+    clock = VirtualClock()
+    transport = CassetteTransport(path, mode="replay", latency=latency, clock=clock)
+    semaphore = asyncio.Semaphore(concurrency)
+    matches = 0
+
+    async def search(client: IqdbClient, data: bytes):
+        nonlocal matches
+        async with semaphore:
+            result = await client.search_file(data)
+        matches += len(result.matches)
+
+    start = time.perf_counter()
+    async with IqdbClient(base_url="https://iqdb.test", transport=transport, clock=clock, include_more_results=True) as client:
+        for _ in range(rounds):
+            await asyncio.gather(*(search(client, data) for data in images))
+    wall = time.perf_counter() - start
+    searches = rounds * len(images)
+    return {"searches": searches, "matches": matches, "wall_seconds": wall, "virtual_seconds": clock.time(), "searches_per_second": searches / wall}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cassette", default=None, help="Cassette có sẵn để phát lại (mặc định: tạo cassette tổng hợp).")
+    parser.add_argument("--files", nargs="*", default=None, help="Các file ảnh đã dùng khi ghi cassette (bắt buộc khi dùng --cassette).")
+    parser.add_argument("--images", type=int, default=100, help="Số ảnh cho cassette tổng hợp (mặc định: 100).")
+    parser.add_argument("--rounds", type=int, default=3, help="Số lần phát lại toàn bộ tập ảnh (mặc định: 3).")
+    parser.add_argument("--latency", type=float, default=0.0, help="Độ trễ giả lập cho mỗi response (giây, theo đồng hồ ảo).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Số tìm kiếm chạy song song (mặc định: 8).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.cassette:
+            if not args.files: parser.error("--files là bắt buộc khi dùng --cassette")
+            images = []
+            for name in args.files:
+                with open(name, "rb") as f: images.append(f.read())
+            path = args.cassette
+        else:
+            images = make_images(args.images)
+            path = os.path.join(tmp, "synthetic.json.gz")
+            asyncio.run(record_synthetic(path, images))
+
+        stats = asyncio.run(replay(path, images, args.rounds, args.latency, args.concurrency))
+    print(f"{stats['searches']} tìm kiếm ({stats['matches']} kết quả) trong {stats['wall_seconds']:.2f}s thật "
+          f"= {stats['searches_per_second']:.1f} tìm kiếm/s; tương đương {stats['virtual_seconds'] / 3600:.2f} giờ nếu chạy với mạng thật")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
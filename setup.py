@@ -47,6 +47,11 @@ setup(
             "types-Pillow",
         ],
     },
+    entry_points={
+        "console_scripts": [
+            "iqdb=iqdb_api.cli:main",
+        ],
+    },
     keywords="iqdb reverse image search anime manga cosplay",
     project_urls={
         "Bug Reports": "https://github.com/hieuxyz00/iqdb-api-python/issues",
@@ -5,21 +5,48 @@ Thư viện này cung cấp giao diện Python để tương tác với dịch v
 IQDB (Internet Query Database) tại iqdb.org và 3d.iqdb.org.
 """
 
-from .client import IqdbClient, Iqdb3dClient, SyncIqdbClient, SyncIqdb3dClient
-from .models import SearchResult, Match, YourImage, Resolution, SearchMoreInfo
-from .enums import MatchType, Rating, Source
-from .exceptions import (
-    IqdbApiException,
-    ImageTooLargeException,
-    HttpRequestFailedException,
-    NotImageException,
-    InvalidFileFormatException,
-    UserCancelledException,
-    NoMatchFoundException,
-    InvalidIqdbHtmlException,
-    ParseException,
-    ReadQueryResultException,
-)
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .client import IqdbClient, Iqdb3dClient, SyncIqdbClient, SyncIqdb3dClient
+    from .cache import LRUByteCache
+    from .clock import SystemClock, VirtualClock
+    from .transport import CassetteTransport, CassetteMissException
+    from .classifier import MatchTextClassifier, MatchTextInfo, register_source
+    from .enrichment import BooruEnricher, BooruSite, DanbooruSite, GelbooruSite, YandereSite, KonachanSite
+    from .models import SearchResult, Match, YourImage, Resolution, SearchMoreInfo, BooruPost, ServiceSearchStats
+    from .enums import MatchType, Rating, Source
+    from .exceptions import (
+        IqdbApiException,
+        ImageTooLargeException,
+        HttpRequestFailedException,
+        NotImageException,
+        InvalidFileFormatException,
+        UserCancelledException,
+        NoMatchFoundException,
+        InvalidIqdbHtmlException,
+        ParseException,
+        ReadQueryResultException,
+    )
+
+# Các thuộc tính được import lười (PEP 562): `import iqdb_api` không kéo theo
+# httpx, Pillow, bs4 hay lxml cho tới khi thực sự dùng tới client.
+_LAZY_ATTRS = {
+    **dict.fromkeys(["IqdbClient", "Iqdb3dClient", "SyncIqdbClient", "SyncIqdb3dClient"], ".client"),
+    "LRUByteCache": ".cache",
+    **dict.fromkeys(["SystemClock", "VirtualClock"], ".clock"),
+    **dict.fromkeys(["CassetteTransport", "CassetteMissException"], ".transport"),
+    **dict.fromkeys(["MatchTextClassifier", "MatchTextInfo", "register_source"], ".classifier"),
+    **dict.fromkeys(["BooruEnricher", "BooruSite", "DanbooruSite", "GelbooruSite", "YandereSite", "KonachanSite"], ".enrichment"),
+    **dict.fromkeys(["SearchResult", "Match", "YourImage", "Resolution", "SearchMoreInfo", "BooruPost", "ServiceSearchStats"], ".models"),
+    **dict.fromkeys(["MatchType", "Rating", "Source"], ".enums"),
+    **dict.fromkeys([
+        "IqdbApiException", "ImageTooLargeException", "HttpRequestFailedException", "NotImageException",
+        "InvalidFileFormatException", "UserCancelledException", "NoMatchFoundException",
+        "InvalidIqdbHtmlException", "ParseException", "ReadQueryResultException",
+    ], ".exceptions"),
+}
 
 __version__ = "1.0.0"
 __author__ = "hieuxyz"
@@ -30,12 +57,32 @@ __all__ = [
     "Iqdb3dClient",
     "SyncIqdbClient",
     "SyncIqdb3dClient",
+    # Testing / benchmarking
+    "CassetteTransport",
+    "CassetteMissException",
+    "SystemClock",
+    "VirtualClock",
+    # Parsing
+    "MatchTextClassifier",
+    "MatchTextInfo",
+    "register_source",
+    # Caching
+    "LRUByteCache",
+    # Enrichment
+    "BooruEnricher",
+    "BooruSite",
+    "DanbooruSite",
+    "GelbooruSite",
+    "YandereSite",
+    "KonachanSite",
     # Models
     "SearchResult",
     "Match",
     "YourImage",
     "Resolution",
     "SearchMoreInfo",
+    "BooruPost",
+    "ServiceSearchStats",
     # Enums
     "MatchType",
     "Rating",
@@ -51,4 +98,16 @@ __all__ = [
     "InvalidIqdbHtmlException",
     "ParseException",
     "ReadQueryResultException",
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name: str):
+    if (module_name := _LAZY_ATTRS.get(name)) is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,200 @@
+"""
+Các bộ nhớ đệm (cache) dùng trong IQDB API.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Callable, Generic, Hashable, List, Optional, Tuple, TypeVar, Union
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """
+    Cache trong bộ nhớ với thời gian sống (TTL) cho từng phần tử.
+
+    Khi vượt quá `max_entries`, phần tử ít được dùng gần đây nhất sẽ bị loại bỏ.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600.0, max_entries: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        if (entry := self._data.get(key)) is None: return None
+        expires_at, value = entry
+        if expires_at < self._clock():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V):
+        self._data[key] = (self._clock() + self.ttl_seconds, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool: return self.get(key) is not None
+    def __len__(self) -> int: return len(self._data)
+    def clear(self): self._data.clear()
+
+
+class LRUByteCache:
+    """
+    Cache LRU cho dữ liệu nhị phân, giới hạn theo tổng dung lượng.
+
+    Gồm một tầng bộ nhớ và một tầng đĩa tùy chọn. Dữ liệu được ghi xuống đĩa khi
+    được thêm vào, và dữ liệu trên đĩa được nạp lại lên bộ nhớ khi được đọc.
+    Trong code async, dùng `aget`/`aset` để IO của tầng đĩa chạy trong executor.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, disk_dir: Optional[Union[str, Path]] = None, disk_max_bytes: int = 256 * 1024 * 1024):
+        """
+        Args:
+            max_bytes (int): Dung lượng tối đa của tầng bộ nhớ.
+            disk_dir (str | Path): Thư mục cho tầng đĩa; `None` để tắt.
+            disk_max_bytes (int): Dung lượng tối đa của tầng đĩa.
+        """
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_dir = Path(disk_dir) if disk_dir is not None else None
+        self._disk_index: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        if self._disk_dir is not None:
+            self._disk_dir.mkdir(parents=True, exist_ok=True)
+            for path in sorted(self._disk_dir.glob("*.bin"), key=lambda p: p.stat().st_mtime):
+                self._disk_index[path.stem] = path.stat().st_size
+                self._disk_bytes += self._disk_index[path.stem]
+            self._evict_disk()
+
+    def get(self, key: str) -> Optional[bytes]:
+        if (data := self._get_memory(key)) is not None or (name := self._disk_lookup(key)) is None: return data
+        return self._loaded_from_disk(key, name, self._read_file(name))
+
+    def set(self, key: str, data: bytes):
+        self._set_memory(key, data)
+        if not self._fits_disk(data): return
+        name = self._disk_name(key)
+        if self._write_file(name, data): self._remove_files(self._written_to_disk(name, len(data)))
+
+    async def aget(self, key: str, executor: Optional[Executor] = None) -> Optional[bytes]:
+        """Như `get`, nhưng đọc tầng đĩa trong executor để không chặn event loop."""
+        if (data := self._get_memory(key)) is not None or (name := self._disk_lookup(key)) is None: return data
+        data = await asyncio.get_running_loop().run_in_executor(executor, self._read_file, name)
+        return self._loaded_from_disk(key, name, data)
+
+    async def aset(self, key: str, data: bytes, executor: Optional[Executor] = None):
+        """Như `set`, nhưng ghi/xóa file của tầng đĩa trong executor để không chặn event loop."""
+        self._set_memory(key, data)
+        if not self._fits_disk(data): return
+        name = self._disk_name(key)
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(executor, self._write_file, name, data): return
+        if evicted := self._written_to_disk(name, len(data)): await loop.run_in_executor(executor, self._remove_files, evicted)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._memory or self._disk_name(key) in self._disk_index
+
+    def __len__(self) -> int: return len(self._memory)
+
+    @property
+    def memory_bytes(self) -> int: return self._memory_bytes
+
+    @property
+    def disk_bytes(self) -> int: return self._disk_bytes
+
+    def clear(self):
+        self._memory.clear()
+        self._memory_bytes = 0
+        for name in list(self._disk_index): self._remove_disk(name)
+
+    def _set_memory(self, key: str, data: bytes):
+        if len(data) > self.max_bytes: return
+        if (old := self._memory.pop(key, None)) is not None: self._memory_bytes -= len(old)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _get_memory(self, key: str) -> Optional[bytes]:
+        if (data := self._memory.get(key)) is not None: self._memory.move_to_end(key)
+        return data
+
+    @staticmethod
+    def _disk_name(key: str) -> str:
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def _disk_lookup(self, key: str) -> Optional[str]:
+        if self._disk_dir is None or (name := self._disk_name(key)) not in self._disk_index: return None
+        return name
+
+    def _fits_disk(self, data: bytes) -> bool:
+        return self._disk_dir is not None and len(data) <= self.disk_max_bytes
+
+    # Các hàm `_read_file`, `_write_file`, `_remove_files` chỉ làm IO (có thể chạy trong
+    # executor); chỉ mục đĩa chỉ được cập nhật trên luồng của người gọi.
+    def _read_file(self, name: str) -> Optional[bytes]:
+        try:
+            return (self._disk_dir / f"{name}.bin").read_bytes()
+        except OSError:
+            return None
+
+    def _write_file(self, name: str, data: bytes) -> bool:
+        # Ghi ra file tạm rồi đổi tên, để lần đọc đồng thời không thấy file ghi dở
+        tmp = self._disk_dir / f"{name}.{threading.get_ident()}.tmp"
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, self._disk_dir / f"{name}.bin")
+            return True
+        except OSError:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            return False
+
+    def _remove_files(self, names: List[str]):
+        for name in names:
+            try:
+                (self._disk_dir / f"{name}.bin").unlink()
+            except OSError:
+                pass
+
+    def _loaded_from_disk(self, key: str, name: str, data: Optional[bytes]) -> Optional[bytes]:
+        if name not in self._disk_index: return None  # Đã bị loại bỏ trong lúc đang đọc
+        if data is None:
+            self._disk_bytes -= self._disk_index.pop(name)
+            return None
+        self._disk_index.move_to_end(name)
+        self._set_memory(key, data)
+        return data
+
+    def _written_to_disk(self, name: str, size: int) -> List[str]:
+        """Ghi nhận file vừa ghi vào chỉ mục, trả về tên các file bị loại bỏ (cần xóa khỏi đĩa)."""
+        self._disk_bytes += size - self._disk_index.pop(name, 0)
+        self._disk_index[name] = size
+        evicted = []
+        while self._disk_bytes > self.disk_max_bytes and self._disk_index:
+            evicted_name, evicted_size = self._disk_index.popitem(last=False)
+            self._disk_bytes -= evicted_size
+            evicted.append(evicted_name)
+        return evicted
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.disk_max_bytes and self._disk_index:
+            self._remove_disk(next(iter(self._disk_index)))
+
+    def _remove_disk(self, name: str):
+        self._disk_bytes -= self._disk_index.pop(name)
+        self._remove_files([name])
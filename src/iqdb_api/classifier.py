@@ -0,0 +1,106 @@
+"""
+Trích xuất nguồn, rating, độ tương đồng và độ phân giải từ text của một kết quả IQDB.
+
+Tất cả được gom vào một regex alternation biên dịch sẵn và chỉ quét text một lần.
+Có thể đăng ký thêm nhãn nguồn (ví dụ dịch vụ IQDB hoặc nguồn 3D mới) mà không
+cần sửa parser.
+"""
+import re
+from typing import Dict, Mapping, NamedTuple, Optional
+
+from .enums import Rating, Source
+from .models import Resolution
+
+DEFAULT_SOURCE_LABELS: Dict[str, Source] = {
+    'Danbooru': Source.DANBOORU, 'Konachan': Source.KONACHAN,
+    'yande.re': Source.YANDERE, 'Gelbooru': Source.GELBOORU,
+    'Sankaku Channel': Source.SANKAKU_CHANNEL, 'e-shuushuu': Source.ESHUUSHUU,
+    'The Anime Gallery': Source.THE_ANIME_GALLERY, 'Zerochan': Source.ZEROCHAN,
+    'Anime-Pictures': Source.ANIME_PICTURES, '3dbooru': Source.THREEBOORU,
+    'Idol Complex': Source.IDOL_COMPLEX,
+}
+
+RATING_MARKERS: Dict[str, Rating] = {
+    'safe': Rating.SAFE, 'ero': Rating.QUESTIONABLE,
+    'questionable': Rating.QUESTIONABLE, 'explicit': Rating.EXPLICIT,
+}
+# Khi text có nhiều marker, rating có độ ưu tiên cao hơn (số nhỏ hơn) được chọn
+_RATING_PRIORITY = {Rating.SAFE: 0, Rating.QUESTIONABLE: 1, Rating.EXPLICIT: 2}
+
+
+class MatchTextInfo(NamedTuple):
+    """Các thông tin trích xuất được từ text của một kết quả."""
+    source: Optional[Source] = None
+    rating: Rating = Rating.UNRATED
+    similarity: Optional[float] = None
+    resolution: Optional[Resolution] = None
+
+
+class MatchTextClassifier:
+    """
+    Phân loại text của một kết quả IQDB trong một lần quét.
+
+    Regex được biên dịch một lần và chỉ biên dịch lại khi có nhãn nguồn mới được đăng ký.
+    Khi text chứa nhiều nguồn (một ảnh có mặt trên nhiều booru), nguồn đăng ký trước
+    được ưu tiên; rating ưu tiên theo thứ tự safe > ero/questionable > explicit.
+    """
+
+    def __init__(self, source_labels: Optional[Mapping[str, Source]] = None):
+        self._source_labels: Dict[str, Source] = dict(DEFAULT_SOURCE_LABELS if source_labels is None else source_labels)
+        self._pattern: Optional["re.Pattern[str]"] = None
+        self._source_priority: Dict[str, int] = {}
+
+    @property
+    def source_labels(self) -> Dict[str, Source]:
+        return dict(self._source_labels)
+
+    def register_source(self, label: str, source: Source):
+        """Đăng ký một nhãn (phân biệt hoa thường, như hiển thị trên IQDB) cho một nguồn."""
+        if not label: raise ValueError("Nhãn nguồn không được để trống")
+        self._source_labels[label] = source
+        self._pattern = None
+
+    def classify(self, text: str) -> MatchTextInfo:
+        source_label: Optional[str] = None
+        rating: Optional[Rating] = None
+        similarity = resolution = None
+        pattern, priority = self._get_pattern(), self._source_priority
+        for match in pattern.finditer(text):
+            kind = match.lastgroup
+            if kind == 'similarity':
+                if similarity is None: similarity = float(match.group('similarity_value'))
+            elif kind == 'resolution':
+                if resolution is None: resolution = Resolution(width=int(match.group('width')), height=int(match.group('height')))
+            elif kind == 'rating':
+                found = RATING_MARKERS[match.group('rating_value').lower()]
+                if rating is None or _RATING_PRIORITY[found] < _RATING_PRIORITY[rating]: rating = found
+            elif kind == 'source':
+                label = match.group('source')
+                if source_label is None or priority[label] < priority[source_label]: source_label = label
+        return MatchTextInfo(
+            source=self._source_labels[source_label] if source_label is not None else None,
+            rating=rating or Rating.UNRATED, similarity=similarity, resolution=resolution,
+        )
+
+    def _get_pattern(self) -> "re.Pattern[str]":
+        if self._pattern is None:
+            # Nhãn dài hơn đứng trước để không bị nhãn ngắn trùng tiền tố "nuốt" mất
+            self._source_priority = {label: i for i, label in enumerate(self._source_labels)}
+            labels = sorted(self._source_labels, key=len, reverse=True)
+            ratings = '|'.join(sorted(RATING_MARKERS, key=len, reverse=True))
+            alternatives = [
+                r'(?P<similarity>(?P<similarity_value>\d+)% similarity)',
+                r'(?P<resolution>(?P<width>\d+)×(?P<height>\d+))',
+                rf'(?P<rating>\[(?P<rating_value>(?i:{ratings}))\])',
+            ]
+            if labels: alternatives.append('(?P<source>' + '|'.join(map(re.escape, labels)) + ')')
+            self._pattern = re.compile('|'.join(alternatives))
+        return self._pattern
+
+
+default_classifier = MatchTextClassifier()
+
+
+def register_source(label: str, source: Source):
+    """Đăng ký nhãn nguồn cho classifier mặc định được dùng bởi mọi `SearchResultParser`."""
+    default_classifier.register_source(label, source)
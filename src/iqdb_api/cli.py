@@ -0,0 +1,258 @@
+"""
+Giao diện dòng lệnh cho IQDB API.
+
+Ví dụ:
+    iqdb ./images -o results.ndjson --resume
+    python -m iqdb_api "scans/**/*.png" --format csv -o results.csv --jobs 8
+
+Mỗi kết quả được ghi ra ngay khi hoàn tất (NDJSON hoặc CSV). Các module nặng
+(httpx, Pillow, bs4, lxml) chỉ được import khi thực sự bắt đầu tìm kiếm,
+để `--help` và việc quét thư mục khởi động nhanh.
+"""
+import argparse
+import asyncio
+import csv
+import dataclasses
+import glob
+import hashlib
+import json
+import os
+import sys
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, TextIO
+
+from .cache import TTLCache
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tif", ".tiff"}
+CSV_FIELDS = [
+    "input", "md5", "status", "error", "match_count", "best_url", "best_similarity",
+    "best_source", "best_rating", "searched_images_count", "searched_in_seconds",
+]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="iqdb", description="Tìm kiếm hình ảnh ngược trên IQDB.org từ dòng lệnh.")
+    parser.add_argument("inputs", nargs="+", help="File, thư mục (quét đệ quy), glob (hỗ trợ **) hoặc URL ảnh.")
+    parser.add_argument("-o", "--output", default="-", help="File đầu ra (mặc định: stdout).")
+    parser.add_argument("-f", "--format", choices=("ndjson", "csv"), default="ndjson", help="Định dạng đầu ra (mặc định: ndjson).")
+    parser.add_argument("--resume", action="store_true", help="Bỏ qua các input đã có kết quả thành công trong file đầu ra và ghi tiếp vào cuối file.")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Số tác vụ xử lý song song (mặc định: 4).")
+    parser.add_argument("--3d", dest="use_3d", action="store_true", help="Dùng 3d.iqdb.org (Iqdb3dClient).")
+    parser.add_argument("--services", default=None, help="Danh sách nguồn cần tìm, cách nhau bởi dấu phẩy (ví dụ: danbooru,gelbooru). Mặc định: tất cả.")
+    parser.add_argument("--stats", action="store_true", help="In thống kê thời gian tìm kiếm phía server theo tập nguồn ra stderr khi kết thúc.")
+    parser.add_argument("--base-url", default=None, help="Ghi đè URL của dịch vụ IQDB (ví dụ mock server cục bộ).")
+    parser.add_argument("--more", action="store_true", help="Lấy thêm kết quả từ trang \"Give me more!\".")
+    parser.add_argument("--ignore-colors", action="store_true", help="Bỏ qua màu sắc khi tìm kiếm.")
+    parser.add_argument("--max-retries", type=int, default=3, help="Số lần thử lại tối đa (mặc định: 3).")
+    parser.add_argument("--retry-delay", type=float, default=2.0, help="Thời gian chờ giữa các lần thử lại (mặc định: 2.0s).")
+    parser.add_argument("--rate-limit", type=float, default=5.1, help="Thời gian chờ tối thiểu giữa các request (mặc định: 5.1s).")
+    parser.add_argument("--timeout", type=float, default=None, help="Thời gian chờ cho HTTP request.")
+    parser.add_argument("--no-prevent-bans", action="store_true", help="Tắt các cơ chế chống bị chặn.")
+    return parser
+
+
+def iter_inputs(inputs: Sequence[str]) -> Iterator[str]:
+    """Mở rộng danh sách input thành từng file/URL, không tải toàn bộ vào bộ nhớ."""
+    for item in inputs:
+        if item.startswith(("http://", "https://")):
+            yield item
+        elif os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS: yield os.path.join(root, name)
+        elif glob.has_magic(item):
+            for path in glob.iglob(item, recursive=True):
+                if os.path.isfile(path): yield path
+        else:
+            yield item
+
+
+def load_completed(output: str, fmt: str) -> Set[str]:
+    """Đọc file đầu ra có sẵn và trả về các input đã được xử lý thành công."""
+    if output == "-" or not os.path.exists(output): return set()
+    done = set()
+    with open(output, "r", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            rows: Iterator[Dict[str, Any]] = csv.DictReader(f)
+        else:
+            rows = _iter_json_lines(f)
+        for row in rows:
+            if isinstance(row, dict) and row.get("status") == "ok" and row.get("input"): done.add(row["input"])
+    return done
+
+
+def _iter_json_lines(f: TextIO) -> Iterator[Any]:
+    for line in f:
+        if not line.strip(): continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue  # Dòng bị cắt dở nếu lần chạy trước bị ngắt
+
+
+def truncate_partial_line(path: str):
+    """Cắt bỏ dòng cuối chưa hoàn chỉnh (không kết thúc bằng "\\n") để bản ghi mới không bị dính vào nó."""
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            step = min(64 * 1024, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            if (index := chunk.rfind(b"\n")) != -1:
+                pos = pos - step + index + 1
+                break
+            pos -= step
+        if pos != end: f.truncate(pos)
+
+
+def _to_jsonable(value: Any) -> Any:
+    if isinstance(value, Enum): return value.value
+    if isinstance(value, dict): return {k: _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)): return [_to_jsonable(v) for v in value]
+    return value
+
+
+def _file_md5(path: str) -> str:
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""): h.update(chunk)
+    return h.hexdigest()
+
+
+class _RecordWriter:
+    """Ghi từng bản ghi ra NDJSON hoặc CSV và flush ngay sau mỗi dòng."""
+
+    def __init__(self, stream: TextIO, fmt: str, write_header: bool):
+        self._stream = stream
+        self._fmt = fmt
+        self._csv = csv.DictWriter(stream, fieldnames=CSV_FIELDS, extrasaction="ignore") if fmt == "csv" else None
+        if self._csv and write_header: self._csv.writeheader()
+
+    def write(self, record: Dict[str, Any]):
+        if self._csv:
+            self._csv.writerow(self._flatten(record))
+        else:
+            self._stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._stream.flush()
+
+    @staticmethod
+    def _flatten(record: Dict[str, Any]) -> Dict[str, Any]:
+        row = {k: record.get(k) for k in CSV_FIELDS}
+        matches = record.get("matches") or []
+        row["match_count"] = len(matches) if record.get("status") == "ok" else None
+        if matches:
+            best = max(matches, key=lambda m: m.get("similarity") or 0)
+            row.update(best_url=best.get("url"), best_similarity=best.get("similarity"), best_source=best.get("source"), best_rating=best.get("rating"))
+        return row
+
+
+async def _run(args: argparse.Namespace) -> int:
+    from .client import IqdbClient, Iqdb3dClient
+    from .exceptions import UserCancelledException
+
+    client_cls = Iqdb3dClient if args.use_3d else IqdbClient
+    client_kwargs: Dict[str, Any] = {"base_url": args.base_url} if args.base_url else {}
+    if args.services:
+        names = [name.strip().lower() for name in args.services.split(",") if name.strip()]
+        supported = {s.value: s for s in client_cls.SERVICE_IDS}
+        if invalid := [name for name in names if name not in supported]:
+            print(f"Nguồn không hợp lệ: {', '.join(invalid)}. Các giá trị hợp lệ: {', '.join(supported)}", file=sys.stderr)
+            return 2
+        client_kwargs["services"] = [supported[name] for name in names]
+    completed = load_completed(args.output, args.format) if args.resume else set()
+    if args.resume and args.output != "-" and os.path.exists(args.output): truncate_partial_line(args.output)
+    append = args.resume and args.output != "-" and os.path.exists(args.output) and os.path.getsize(args.output) > 0
+    stream = sys.stdout if args.output == "-" else open(args.output, "a" if append else "w", encoding="utf-8", newline="")
+    writer = _RecordWriter(stream, args.format, write_header=not append)
+
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=args.jobs * 4)
+    searches: TTLCache["asyncio.Future"] = TTLCache(ttl_seconds=24 * 3600, max_entries=10000)
+    failures = 0
+    workers: List["asyncio.Future[None]"] = []
+
+    async def search(client: IqdbClient, item: str) -> Dict[str, Any]:
+        if item.startswith(("http://", "https://")):
+            return {"md5": None, "result": await client.search_url(item)}
+        md5 = await loop.run_in_executor(None, _file_md5, item)
+        # Các file trùng nội dung dùng chung một lần tìm kiếm
+        if (future := searches.get(md5)) is None:
+            async def do_search():
+                file_data, file_name = await loop.run_in_executor(None, client._prepare_file_data, item)
+                return await client._search_file_data(file_data, file_name)
+            future = asyncio.ensure_future(do_search())
+            searches.set(md5, future)
+        return {"md5": md5, "result": await asyncio.shield(future)}
+
+    async def worker(client: IqdbClient):
+        nonlocal failures
+        while (item := await queue.get()) is not None:
+            record: Dict[str, Any] = {"input": item, "md5": None, "status": "ok", "error": None}
+            try:
+                found = await search(client, item)
+                result = found["result"]
+                record.update(
+                    md5=found["md5"], searched_images_count=result.searched_images_count,
+                    searched_in_seconds=result.searched_in_seconds,
+                    your_image=_to_jsonable(dataclasses.asdict(result.your_image)) if result.your_image else None,
+                    matches=[_to_jsonable(dataclasses.asdict(m)) for m in result.matches],
+                )
+            except UserCancelledException as e:
+                # Lần chạy bị hủy, không phải lỗi của riêng input này: truyền tiếp việc hủy
+                raise asyncio.CancelledError() from e
+            except Exception as e:  # Một input lỗi không được làm dừng cả lần chạy
+                failures += 1
+                record.update(status="error", error=f"{type(e).__name__}: {e}")
+            writer.write(record)
+
+    async def enqueue(item: Optional[str]):
+        if not queue.full():
+            queue.put_nowait(item)
+            return
+        # Chờ chỗ trống trong hàng đợi, nhưng dừng ngay nếu có worker kết thúc bất thường
+        put_task = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait([put_task, *workers], return_when=asyncio.FIRST_COMPLETED)
+        if not put_task.done():
+            put_task.cancel()
+            for w in workers:
+                if w.done(): w.result()
+            raise RuntimeError("Worker đã dừng trước khi xử lý hết input.")
+
+    try:
+        async with client_cls(
+            rate_limit_seconds=args.rate_limit, timeout=args.timeout, ignore_colors=args.ignore_colors,
+            include_more_results=args.more, max_retries=args.max_retries, retry_delay=args.retry_delay,
+            prevent_bans=not args.no_prevent_bans, **client_kwargs,
+        ) as client:
+            workers.extend(asyncio.ensure_future(worker(client)) for _ in range(max(1, args.jobs)))
+            try:
+                for item in iter_inputs(args.inputs):
+                    if item not in completed: await enqueue(item)
+                for _ in workers: await enqueue(None)
+                await asyncio.gather(*workers)
+            finally:
+                for w in workers: w.cancel()
+                # Chờ worker dừng hẳn trước khi đóng file output
+                await asyncio.gather(*workers, return_exceptions=True)
+            if args.stats:
+                for stats in client.search_stats.values():
+                    names = ",".join(s.value for s in stats.services) or "mặc định"
+                    print(f"[{names}] {stats.queries} truy vấn, trung bình {stats.average_images:,.0f} ảnh trong {stats.average_seconds:.3f}s", file=sys.stderr)
+    finally:
+        if stream is not sys.stdout: stream.close()
+    return 1 if failures else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        print("Đã hủy bởi người dùng.", file=sys.stderr)
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,16 +5,21 @@ import random
 import time
 from io import BytesIO
 from pathlib import Path
-from typing import BinaryIO, List, Dict, Tuple, Union, Callable, Awaitable
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Any, BinaryIO, List, Dict, Tuple, Union, Callable, Awaitable, Iterable, Optional
 
 import httpx
-from PIL import Image
-from bs4 import BeautifulSoup
 
+from .cache import LRUByteCache
+from .clock import Clock, SystemClock
+from .enums import Source
 from .exceptions import *
-from .models import SearchResult
+from .models import Match, SearchResult, ServiceSearchStats, YourImage
 from .parser import SearchResultParser
 
+if TYPE_CHECKING:
+    from PIL.Image import Image as PILImage
+
 
 class IqdbClient:
     """
@@ -25,6 +30,13 @@ class IqdbClient:
     _DEFAULT_ACCEPT_HEADERS = ["text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8"]
     _DEFAULT_REFERERS = ["https://iqdb.org/", "https://www.google.com/"]
 
+    # Giá trị `service[]` trong form tìm kiếm của IQDB cho từng nguồn
+    SERVICE_IDS: Dict[Source, int] = {
+        Source.DANBOORU: 1, Source.KONACHAN: 2, Source.YANDERE: 3, Source.GELBOORU: 4,
+        Source.SANKAKU_CHANNEL: 5, Source.ESHUUSHUU: 6, Source.THE_ANIME_GALLERY: 10,
+        Source.ZEROCHAN: 11, Source.ANIME_PICTURES: 13,
+    }
+
     def __init__(
         self,
         base_url: str = "https://www.iqdb.org",
@@ -35,6 +47,10 @@ class IqdbClient:
         max_retries: int = 3,
         retry_delay: float = 2.0,
         prevent_bans: bool = True,
+        services: Optional[Iterable[Source]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        clock: Optional[Clock] = None,
+        preview_cache: Optional[LRUByteCache] = None,
     ):
         """
         Khởi tạo IQDB client.
@@ -49,6 +65,14 @@ class IqdbClient:
             max_retries (int): Số lần thử lại tối đa khi gặp lỗi 'Can't read query result'.
             retry_delay (float): Thời gian chờ (giây) giữa các lần thử lại.
             prevent_bans (bool): Kích hoạt các cơ chế chống bị chặn.
+            services (Iterable[Source]): Các nguồn cần tìm kiếm (mặc định: tất cả nguồn của dịch vụ).
+                                         Chọn ít nguồn hơn giúp giảm thời gian tìm kiếm phía server.
+            transport (httpx.AsyncBaseTransport): Transport HTTP tùy chỉnh, ví dụ `CassetteTransport`
+                                                  để ghi lại/phát lại request mà không cần mạng.
+            clock: Đồng hồ dùng cho giới hạn tốc độ và chờ thử lại (mặc định: `SystemClock`).
+                   Dùng `VirtualClock` để bỏ qua thời gian chờ thật.
+            preview_cache (LRUByteCache): Cache cho ảnh thumbnail của `fetch_previews`
+                                          (mặc định: LRU 32MB trong bộ nhớ).
         """
         self.base_url = base_url.rstrip("/")
         self.rate_limit_seconds = rate_limit_seconds
@@ -58,11 +82,16 @@ class IqdbClient:
         self.max_retries = max_retries
         self.retry_delay = retry_delay
         self.prevent_bans = prevent_bans
-        self._client = httpx.AsyncClient(timeout=timeout, follow_redirects=True)
+        self.services = self._resolve_services(services)
+        self.search_stats: Dict[Tuple[Source, ...], ServiceSearchStats] = {}
+        self._clock = clock or SystemClock()
+        self._client = httpx.AsyncClient(timeout=timeout, follow_redirects=True, transport=transport)
         self._parser = SearchResultParser()
         self._last_request_time = 0.0
         self._rate_limit_lock = asyncio.Lock()
         self._session_id = self._generate_session_id()
+        self._preview_cache = preview_cache if preview_cache is not None else LRUByteCache()
+        self._preview_downloads: Dict[str, "asyncio.Future[Optional[bytes]]"] = {}
 
     async def __aenter__(self): return self
     async def __aexit__(self, exc_type, exc_val, exc_tb): await self.close()
@@ -77,50 +106,59 @@ class IqdbClient:
                 response = await request_func()
                 response.raise_for_status()
                 # Phân tích sơ bộ để phát hiện lỗi có thể thử lại
-                self._parser._check_for_errors(BeautifulSoup(response.text, 'lxml'), response.text)
+                self._parser._check_for_errors(self._parser._make_soup(response.text), response.text)
                 return response
             except ReadQueryResultException as e:
                 last_exception = e
                 if attempt >= self.max_retries: break
                 if self._should_debug():
                     print(f"DEBUG: Gặp lỗi có thể thử lại, đang chờ {self.retry_delay}s... (Lần {attempt + 1}/{self.max_retries})")
-                await asyncio.sleep(self.retry_delay + random.uniform(0, 1))
+                await self._clock.sleep(self.retry_delay + random.uniform(0, 1))
         raise last_exception
 
-    async def search_url(self, image_url: str) -> SearchResult:
+    async def search_url(self, image_url: str, services: Optional[Iterable[Source]] = None) -> SearchResult:
         try:
             if not image_url or not image_url.strip(): raise ValueError("URL hình ảnh không được để trống")
+            selected = self._resolve_services(services) if services is not None else self.services
             
             def request_lambda():
                 params = {"url": image_url}
-                params.update(self._prepare_search_data())
+                params.update(self._prepare_search_data(services=selected))
                 headers = self._get_random_headers()
                 return self._client.get(f"{self.base_url}/", params=params, headers=headers)
             
             response = await self._make_request_with_retries(request_lambda)
-            result = self._parser.parse_result(response.text, self._should_debug())
+            result = self._parse_response(response, selected)
             return await self._fetch_more_results_if_needed(result)
         except NotImageException as e:
             try:
                 image_data = await self._download_image_from_url(image_url.strip())
-                return await self.search_file(image_data)
+                return await self.search_file(image_data, services=services)
             except Exception as download_exc: raise e from download_exc
         except (KeyboardInterrupt, asyncio.CancelledError) as e:
             raise UserCancelledException(inner_exception=e) from e
 
-    async def search_file(self, file_input: Union[str, Path, BinaryIO, bytes]) -> SearchResult:
+    async def search_file(self, file_input: Union[str, Path, BinaryIO, bytes], services: Optional[Iterable[Source]] = None) -> SearchResult:
         try:
             file_data, file_name = self._prepare_file_data(file_input)
+            return await self._search_file_data(file_data, file_name, services=services)
+        except (KeyboardInterrupt, asyncio.CancelledError) as e:
+            raise UserCancelledException(inner_exception=e) from e
+
+    async def _search_file_data(self, file_data: bytes, file_name: str, services: Optional[Iterable[Source]] = None) -> SearchResult:
+        """Tìm kiếm với dữ liệu ảnh đã được chuẩn bị bởi `_prepare_file_data`."""
+        try:
             if len(file_data) > 8 * 1024 * 1024: raise ImageTooLargeException()
+            selected = self._resolve_services(services) if services is not None else self.services
 
             def request_lambda():
                 files = {"file": (file_name, BytesIO(file_data), "image/jpeg")}
-                data = self._prepare_search_data(is_file_upload=True)
+                data = self._prepare_search_data(is_file_upload=True, services=selected)
                 headers = self._get_random_headers()
                 return self._client.post(f"{self.base_url}/", files=files, data=data, headers=headers)
             
             response = await self._make_request_with_retries(request_lambda)
-            result = self._parser.parse_result(response.text, self._should_debug())
+            result = self._parse_response(response, selected)
             return await self._fetch_more_results_if_needed(result)
         except (KeyboardInterrupt, asyncio.CancelledError) as e:
             raise UserCancelledException(inner_exception=e) from e
@@ -140,20 +178,130 @@ class IqdbClient:
             response = await self._make_request_with_retries(
                 lambda: self._client.get(more_url, headers=headers)
             )
-            more_page_result = self._parser.parse_result(response.text, self._should_debug())
+            # Trang "more" chỉ hiển thị thêm kết quả của cùng truy vấn, nên không cộng thống kê lần nữa
+            more_page_result = self._parse_response(response, initial_result.services, record_stats=False)
             return more_page_result
         except (ReadQueryResultException, httpx.HTTPError) as e:
             if self._should_debug():
                 print(f"DEBUG: Yêu cầu 'more results' thất bại sau khi đã thử lại. Trả về kết quả ban đầu. Lỗi: {e}")
             return initial_result
             
-    def _prepare_search_data(self, is_file_upload: bool = False) -> dict:
+    def _parse_response(self, response: httpx.Response, services: Optional[List[Source]], record_stats: bool = True) -> SearchResult:
+        result = self._parser.parse_result(response.text, self._should_debug())
+        result.services = list(services) if services is not None else self._default_services()
+        if record_stats: self._record_search_stats(result)
+        return result
+
+    def _default_services(self) -> Optional[List[Source]]:
+        """Các nguồn được tìm khi không chọn nguồn nào; `None` nghĩa là để server tự quyết định."""
+        return list(self.SERVICE_IDS)
+
+    def _record_search_stats(self, result: SearchResult):
+        """Cộng dồn thống kê "Searched N images in X seconds" theo tập dịch vụ đã chọn; tuple rỗng là mặc định của server."""
+        key = tuple(result.services or ())
+        stats = self.search_stats.setdefault(key, ServiceSearchStats(services=key))
+        stats.queries += 1
+        stats.searched_images += result.searched_images_count
+        stats.searched_seconds += result.searched_in_seconds
+        if self._should_debug():
+            names = ", ".join(s.value for s in key) or "mặc định"
+            print(f"DEBUG: [{names}] đã tìm {result.searched_images_count} ảnh trong {result.searched_in_seconds}s (trung bình {stats.average_seconds:.3f}s/{stats.queries} truy vấn)")
+
+    def _resolve_services(self, services: Optional[Iterable[Source]]) -> Optional[List[Source]]:
+        """Kiểm tra và chuẩn hóa danh sách nguồn (bỏ trùng, sắp theo `SERVICE_IDS`); `None` nghĩa là dùng mặc định của dịch vụ."""
+        if services is None: return None
+        selected = list(dict.fromkeys(services))
+        if not selected: raise ValueError("Danh sách dịch vụ không được để trống")
+        if unsupported := [s for s in selected if s not in self.SERVICE_IDS]:
+            raise ValueError(f"{type(self).__name__} không hỗ trợ các nguồn: {', '.join(str(s) for s in unsupported)}")
+        # Thứ tự cố định để cùng một tập nguồn luôn dùng chung một khóa thống kê
+        return sorted(selected, key=self.SERVICE_IDS.__getitem__)
+
+    def _prepare_search_data(self, is_file_upload: bool = False, services: Optional[List[Source]] = None) -> dict:
         data: Dict[str, Union[str, List[int]]] = {}
         if self.ignore_colors: data["forcegray"] = "1"
-        data["service"] = [1, 2, 3, 4, 5, 6, 10, 11, 13]
+        data["service"] = [self.SERVICE_IDS[s] for s in services or self.SERVICE_IDS]
         if is_file_upload: data["url"] = ""
         return data
 
+    async def fetch_previews(
+        self,
+        results: Iterable[Union[SearchResult, Match, YourImage]],
+        max_concurrency: int = 8,
+        decode: bool = False,
+        max_size: Optional[Tuple[int, int]] = None,
+        executor: Optional[Executor] = None,
+    ) -> Dict[str, Union[bytes, "PILImage"]]:
+        """
+        Tải song song ảnh thumbnail (`preview_url`) của các kết quả, dùng chung connection pool của client.
+
+        URL trùng nhau chỉ được tải một lần; ảnh đã tải được giữ trong `preview_cache`.
+        Thumbnail tải thất bại sẽ không có mặt trong kết quả trả về.
+
+        Args:
+            results: Các `SearchResult`, `Match` hoặc `YourImage`.
+            max_concurrency (int): Số request tải ảnh chạy đồng thời tối đa.
+            decode (bool): Nếu True, trả về ảnh Pillow đã giải mã thay vì bytes.
+            max_size (Tuple[int, int]): Khi `decode=True`, thu nhỏ ảnh để vừa khung này (giữ tỉ lệ).
+            executor (Executor): Executor dùng để giải mã ảnh (mặc định: executor của event loop).
+
+        Returns:
+            Dict[str, bytes | PIL.Image.Image]: Dữ liệu ảnh theo `preview_url`.
+        """
+        urls = list(dict.fromkeys(self._iter_preview_urls(results)))
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        contents = await asyncio.gather(*(self._fetch_preview(url, semaphore) for url in urls))
+        previews: Dict[str, Any] = {url: data for url, data in zip(urls, contents) if data is not None}
+        if not decode: return previews
+
+        loop = asyncio.get_running_loop()
+        images = await asyncio.gather(*(loop.run_in_executor(executor, self._decode_preview, data, max_size) for data in previews.values()))
+        return {url: image for url, image in zip(previews, images) if image is not None}
+
+    async def _fetch_preview(self, url: str, semaphore: asyncio.Semaphore) -> Optional[bytes]:
+        if (data := await self._preview_cache.aget(url)) is not None: return data
+        # Các lời gọi đồng thời cho cùng một URL dùng chung một lần tải
+        if (future := self._preview_downloads.get(url)) is None:
+            future = asyncio.ensure_future(self._download_preview(url, semaphore))
+            self._preview_downloads[url] = future
+            future.add_done_callback(lambda _: self._preview_downloads.pop(url, None))
+        return await asyncio.shield(future)
+
+    async def _download_preview(self, url: str, semaphore: asyncio.Semaphore) -> Optional[bytes]:
+        async with semaphore:
+            try:
+                response = await self._client.get(url, headers=self._get_random_headers())
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                if self._should_debug():
+                    print(f"DEBUG: Không thể tải thumbnail {url}. Lỗi: {e}")
+                return None
+        await self._preview_cache.aset(url, response.content)
+        return response.content
+
+    @staticmethod
+    def _decode_preview(data: bytes, max_size: Optional[Tuple[int, int]]) -> Optional["PILImage"]:
+        from PIL import Image
+
+        try:
+            img = Image.open(BytesIO(data))
+            if max_size: img.draft("RGB", max_size)  # JPEG: giải mã ở độ phân giải thấp hơn ngay từ đầu
+            img.load()
+            if max_size: img.thumbnail(max_size)
+            return img
+        except Exception:
+            return None
+
+    @staticmethod
+    def _iter_preview_urls(results: Iterable[Union[SearchResult, Match, YourImage]]) -> Iterable[str]:
+        for item in results:
+            if isinstance(item, SearchResult):
+                if item.your_image and item.your_image.preview_url: yield item.your_image.preview_url
+                yield from (m.preview_url for m in item.matches if m.preview_url)
+            elif isinstance(item, (Match, YourImage)):
+                if item.preview_url: yield item.preview_url
+            else: raise TypeError("Chỉ chấp nhận SearchResult, Match hoặc YourImage.")
+
     async def _download_image_from_url(self, image_url: str) -> bytes:
         headers = self._get_random_headers()
         try:
@@ -173,6 +321,8 @@ class IqdbClient:
         return self._convert_image_if_needed(raw_data)
 
     def _convert_image_if_needed(self, image_data: bytes) -> Tuple[bytes, str]:
+        from PIL import Image  # Pillow chỉ được import khi cần xử lý file ảnh
+
         supported = ["jpeg", "jpg", "png", "gif"]
         try:
             img = Image.open(BytesIO(image_data))
@@ -186,11 +336,11 @@ class IqdbClient:
     
     async def _apply_rate_limit(self):
         async with self._rate_limit_lock:
-            since = time.time() - self._last_request_time
+            since = self._clock.time() - self._last_request_time
             sleep_for = self.rate_limit_seconds - since
             if self.prevent_bans: sleep_for += random.uniform(1.0, 2.5)
-            if sleep_for > 0: await asyncio.sleep(sleep_for)
-            self._last_request_time = time.time()
+            if sleep_for > 0: await self._clock.sleep(sleep_for)
+            self._last_request_time = self._clock.time()
             
     def _get_random_headers(self) -> Dict[str, str]:
         if not self.prevent_bans: return {"User-Agent": self._DEFAULT_USER_AGENTS[0]}
@@ -201,14 +351,20 @@ class IqdbClient:
 
 class Iqdb3dClient(IqdbClient):
     """Client cho IQDB 3D (3d.iqdb.org)."""
+
+    SERVICE_IDS: Dict[Source, int] = {Source.THREEBOORU: 7, Source.IDOL_COMPLEX: 9}
+
     def __init__(self, **kwargs):
         kwargs["base_url"] = kwargs.get("base_url", "https://3d.iqdb.org")
         super().__init__(**kwargs)
 
-    def _prepare_search_data(self, is_file_upload: bool = False) -> dict:
-        if is_file_upload:
-            return {"MAX_FILE_SIZE": "8388608", "url": ""}
-        return {}
+    def _prepare_search_data(self, is_file_upload: bool = False, services: Optional[List[Source]] = None) -> dict:
+        data: Dict[str, Union[str, List[int]]] = {"MAX_FILE_SIZE": "8388608", "url": ""} if is_file_upload else {}
+        # Không chọn nguồn thì không gửi `service[]`, để server tìm trên toàn bộ cơ sở dữ liệu như trước
+        if services: data["service"] = [self.SERVICE_IDS[s] for s in services]
+        return data
+
+    def _default_services(self) -> Optional[List[Source]]: return None
 
 class SyncIqdbClient:
     """Wrapper đồng bộ (synchronous) cho IqdbClient."""
@@ -216,8 +372,11 @@ class SyncIqdbClient:
     def __enter__(self): return self
     def __exit__(self, exc_type, exc_val, exc_tb): self.close()
     def close(self): asyncio.run(self._async_client.close())
-    def search_url(self, url: str) -> SearchResult: return asyncio.run(self._async_client.search_url(url))
-    def search_file(self, fi: Union[str, Path, BinaryIO, bytes]) -> SearchResult: return asyncio.run(self._async_client.search_file(fi))
+    def search_url(self, url: str, services: Optional[Iterable[Source]] = None) -> SearchResult: return asyncio.run(self._async_client.search_url(url, services=services))
+    def search_file(self, fi: Union[str, Path, BinaryIO, bytes], services: Optional[Iterable[Source]] = None) -> SearchResult: return asyncio.run(self._async_client.search_file(fi, services=services))
+    def fetch_previews(self, results: Iterable[Union[SearchResult, Match, YourImage]], **kwargs) -> Dict[str, Union[bytes, "PILImage"]]: return asyncio.run(self._async_client.fetch_previews(results, **kwargs))
+    @property
+    def search_stats(self) -> Dict[Tuple[Source, ...], ServiceSearchStats]: return self._async_client.search_stats
 
 class SyncIqdb3dClient:
     """Wrapper đồng bộ (synchronous) cho Iqdb3dClient."""
@@ -225,5 +384,8 @@ class SyncIqdb3dClient:
     def __enter__(self): return self
     def __exit__(self, exc_type, exc_val, exc_tb): self.close()
     def close(self): asyncio.run(self._async_client.close())
-    def search_url(self, url: str) -> SearchResult: return asyncio.run(self._async_client.search_url(url))
-    def search_file(self, fi: Union[str, Path, BinaryIO, bytes]) -> SearchResult: return asyncio.run(self._async_client.search_file(fi))
\ No newline at end of file
+    def search_url(self, url: str, services: Optional[Iterable[Source]] = None) -> SearchResult: return asyncio.run(self._async_client.search_url(url, services=services))
+    def search_file(self, fi: Union[str, Path, BinaryIO, bytes], services: Optional[Iterable[Source]] = None) -> SearchResult: return asyncio.run(self._async_client.search_file(fi, services=services))
+    def fetch_previews(self, results: Iterable[Union[SearchResult, Match, YourImage]], **kwargs) -> Dict[str, Union[bytes, "PILImage"]]: return asyncio.run(self._async_client.fetch_previews(results, **kwargs))
+    @property
+    def search_stats(self) -> Dict[Tuple[Source, ...], ServiceSearchStats]: return self._async_client.search_stats
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""
+Đồng hồ dùng cho giới hạn tốc độ và thời gian chờ giữa các lần thử lại.
+
+Client nhận một đối tượng có `time()` và `async sleep(seconds)`. `VirtualClock`
+cho phép chạy toàn bộ pipeline (ví dụ cùng `CassetteTransport` ở chế độ replay)
+mà không phải chờ thật, trong khi vẫn đo được thời gian "ảo" đã trôi qua.
+"""
+import asyncio
+import time
+from typing import Protocol
+
+
+class Clock(Protocol):
+    """Giao diện đồng hồ mà client sử dụng."""
+    def time(self) -> float: ...
+    async def sleep(self, seconds: float): ...
+
+
+class SystemClock:
+    """Đồng hồ thật: `time.time()` và `asyncio.sleep()`."""
+
+    def time(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock:
+    """Đồng hồ ảo: `sleep()` chỉ cộng thời gian vào đồng hồ rồi trả quyền điều khiển ngay."""
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+
+    def time(self) -> float:
+        return self._now
+
+    async def sleep(self, seconds: float):
+        if seconds > 0: self._now += seconds
+        await asyncio.sleep(0)
+
+    def advance(self, seconds: float):
+        self._now += seconds
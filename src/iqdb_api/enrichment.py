@@ -0,0 +1,289 @@
+"""
+Bổ sung metadata cho kết quả tìm kiếm bằng cách truy vấn API của các booru.
+
+Kết quả từ IQDB chỉ chứa URL, điểm số và tag lấy từ alt text. Module này gom
+post ID từ nhiều kết quả, nhóm theo `Match.source` và lấy metadata theo lô
+(dùng truy vấn nhiều ID của từng trang nếu có), với connection pool, giới hạn
+tốc độ và cache TTL riêng cho mỗi trang.
+"""
+import asyncio
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import httpx
+
+from .cache import TTLCache
+from .enums import Rating, Source
+from .models import BooruPost, Match, Resolution, SearchResult
+
+
+class BooruSite(ABC):
+    """
+    Adapter cho API của một booru.
+
+    Lớp con định nghĩa cách tách post ID từ URL, cách dựng request cho một lô ID
+    (`build_request`) và cách chuyển response thành `BooruPost` (`parse_posts`).
+    """
+
+    source: Source
+    default_base_url: str
+    batch_size: int = 1
+    rate_limit_seconds: float = 1.0
+    _post_id_regex: "re.Pattern[str]"
+    _rating_map: Dict[str, Rating] = {}
+
+    def __init__(self, base_url: Optional[str] = None, rate_limit_seconds: Optional[float] = None, params: Optional[Mapping[str, str]] = None):
+        """
+        Args:
+            base_url (str): URL gốc của API, ví dụ để trỏ tới mock server cục bộ.
+            rate_limit_seconds (float): Thời gian chờ tối thiểu giữa các request tới trang này.
+            params (Mapping[str, str]): Tham số bổ sung cho mọi request (ví dụ `api_key`, `user_id`).
+        """
+        self.base_url = (base_url or self.default_base_url).rstrip("/")
+        if rate_limit_seconds is not None: self.rate_limit_seconds = rate_limit_seconds
+        self.params = dict(params or {})
+
+    def parse_post_id(self, url: str) -> Optional[int]:
+        if match := self._post_id_regex.search(url): return int(match.group(1))
+        return None
+
+    @abstractmethod
+    def build_request(self, post_ids: Sequence[int]) -> Tuple[str, Dict[str, str]]:
+        """Trả về URL và query params để lấy một lô post ID."""
+
+    @abstractmethod
+    def parse_posts(self, payload: Any) -> List[BooruPost]:
+        """Chuyển JSON response thành danh sách `BooruPost`."""
+
+    def _parse_rating(self, value: Optional[str]) -> Rating:
+        return self._rating_map.get((value or "").lower(), Rating.UNRATED)
+
+    def _build_post(self, data: Dict[str, Any], tags: str, width_key: str = "width", height_key: str = "height") -> BooruPost:
+        width, height = data.get(width_key), data.get(height_key)
+        return BooruPost(
+            source=self.source, post_id=int(data["id"]), tags=tags.split(),
+            rating=self._parse_rating(data.get("rating")), score=data.get("score"),
+            md5=data.get("md5"), file_url=data.get("file_url"), source_url=data.get("source") or None,
+            resolution=Resolution(width=int(width), height=int(height)) if width and height else None,
+            raw=data,
+        )
+
+
+class DanbooruSite(BooruSite):
+    """Danbooru: hỗ trợ truy vấn nhiều ID bằng `id:1,2,3`."""
+    source = Source.DANBOORU
+    default_base_url = "https://danbooru.donmai.us"
+    batch_size = 100
+    rate_limit_seconds = 0.2
+    _post_id_regex = re.compile(r'/posts?/(?:show/)?(\d+)')
+    # "s" là sensitive (không phải safe), cùng mức với "sensitive" của Gelbooru
+    _rating_map = {"g": Rating.SAFE, "s": Rating.QUESTIONABLE, "q": Rating.QUESTIONABLE, "e": Rating.EXPLICIT}
+
+    def build_request(self, post_ids: Sequence[int]) -> Tuple[str, Dict[str, str]]:
+        params = {"tags": "id:" + ",".join(map(str, post_ids)), "limit": str(len(post_ids))}
+        params.update(self.params)
+        return f"{self.base_url}/posts.json", params
+
+    def parse_posts(self, payload: Any) -> List[BooruPost]:
+        return [self._build_post(p, p.get("tag_string", ""), "image_width", "image_height") for p in payload or [] if "id" in p]
+
+
+class GelbooruSite(BooruSite):
+    """Gelbooru: hỗ trợ truy vấn nhiều ID bằng cú pháp OR `{id:1 ~ id:2}`."""
+    source = Source.GELBOORU
+    default_base_url = "https://gelbooru.com"
+    batch_size = 50
+    rate_limit_seconds = 0.5
+    _post_id_regex = re.compile(r'[?&]id=(\d+)')
+    _rating_map = {"general": Rating.SAFE, "safe": Rating.SAFE, "sensitive": Rating.QUESTIONABLE, "questionable": Rating.QUESTIONABLE, "explicit": Rating.EXPLICIT}
+
+    def build_request(self, post_ids: Sequence[int]) -> Tuple[str, Dict[str, str]]:
+        tags = f"id:{post_ids[0]}" if len(post_ids) == 1 else "{" + " ~ ".join(f"id:{i}" for i in post_ids) + "}"
+        params = {"page": "dapi", "s": "post", "q": "index", "json": "1", "tags": tags, "limit": str(len(post_ids))}
+        params.update(self.params)
+        return f"{self.base_url}/index.php", params
+
+    def parse_posts(self, payload: Any) -> List[BooruPost]:
+        posts = payload.get("post", []) if isinstance(payload, dict) else payload or []
+        if isinstance(posts, dict): posts = [posts]
+        return [self._build_post(p, p.get("tags", "")) for p in posts if "id" in p]
+
+
+class MoebooruSite(BooruSite):
+    """
+    Moebooru (yande.re, Konachan): metatag `id:` không nhận danh sách ID,
+    nên mỗi request chỉ lấy một post và được chạy song song trong giới hạn tốc độ.
+    """
+    batch_size = 1
+    rate_limit_seconds = 0.5
+    _post_id_regex = re.compile(r'/post/show/(\d+)')
+    _rating_map = {"s": Rating.SAFE, "q": Rating.QUESTIONABLE, "e": Rating.EXPLICIT}
+
+    def build_request(self, post_ids: Sequence[int]) -> Tuple[str, Dict[str, str]]:
+        params = {"tags": f"id:{post_ids[0]}", "limit": "1"}
+        params.update(self.params)
+        return f"{self.base_url}/post.json", params
+
+    def parse_posts(self, payload: Any) -> List[BooruPost]:
+        return [self._build_post(p, p.get("tags", "")) for p in payload or [] if "id" in p]
+
+
+class YandereSite(MoebooruSite):
+    source = Source.YANDERE
+    default_base_url = "https://yande.re"
+
+
+class KonachanSite(MoebooruSite):
+    source = Source.KONACHAN
+    default_base_url = "https://konachan.com"
+
+
+DEFAULT_SITES = (DanbooruSite, GelbooruSite, YandereSite, KonachanSite)
+
+
+class _SiteState:
+    """Connection pool và trạng thái giới hạn tốc độ của một trang."""
+    def __init__(self, site: BooruSite, client: httpx.AsyncClient):
+        self.site = site
+        self.client = client
+        self.last_request_time = 0.0
+        self.rate_limit_lock = asyncio.Lock()
+
+
+class BooruEnricher:
+    """
+    Lấy metadata đầy đủ từ booru cho các `Match` trong kết quả tìm kiếm.
+
+    Ví dụ:
+        async with BooruEnricher() as enricher:
+            await enricher.enrich(results)
+            print(results[0].matches[0].post)
+    """
+
+    def __init__(
+        self,
+        sites: Optional[Iterable[BooruSite]] = None,
+        base_urls: Optional[Mapping[Source, str]] = None,
+        cache_ttl_seconds: float = 3600.0,
+        cache_max_entries: int = 10000,
+        max_connections: int = 4,
+        timeout: float = 30.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Khởi tạo enricher.
+
+        Args:
+            sites (Iterable[BooruSite]): Danh sách adapter; mặc định dùng Danbooru, Gelbooru, yande.re, Konachan.
+            base_urls (Mapping[Source, str]): Ghi đè URL gốc theo nguồn (ví dụ mock server cục bộ).
+                                              Chỉ áp dụng cho các adapter mặc định.
+            cache_ttl_seconds (float): Thời gian sống của metadata trong cache.
+            cache_max_entries (int): Số post tối đa giữ trong cache.
+            max_connections (int): Số kết nối tối đa trong pool của mỗi trang.
+            timeout (float): Thời gian chờ cho HTTP request.
+            transport (httpx.AsyncBaseTransport): Transport HTTP tùy chỉnh dùng chung cho mọi trang
+                                                  (ví dụ `httpx.MockTransport` khi kiểm thử).
+        """
+        if sites is None:
+            base_urls = base_urls or {}
+            sites = [site_cls(base_url=base_urls.get(site_cls.source)) for site_cls in DEFAULT_SITES]
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._states: Dict[Source, _SiteState] = {
+            site.source: _SiteState(site, httpx.AsyncClient(timeout=timeout, limits=limits, follow_redirects=True, transport=transport))
+            for site in sites
+        }
+        self._cache: TTLCache[BooruPost] = TTLCache(ttl_seconds=cache_ttl_seconds, max_entries=cache_max_entries)
+
+    async def __aenter__(self): return self
+    async def __aexit__(self, exc_type, exc_val, exc_tb): await self.close()
+
+    async def close(self):
+        await asyncio.gather(*(state.client.aclose() for state in self._states.values()))
+
+    @property
+    def supported_sources(self) -> List[Source]:
+        return list(self._states)
+
+    async def enrich(self, results: Iterable[Union[SearchResult, Match]]) -> Dict[Tuple[Source, int], BooruPost]:
+        """
+        Gán `Match.post` cho mọi match có nguồn được hỗ trợ.
+
+        Args:
+            results: Các `SearchResult` hoặc `Match`; post ID được gom từ tất cả rồi lấy theo lô.
+
+        Returns:
+            Dict[Tuple[Source, int], BooruPost]: Metadata đã lấy được, theo (nguồn, post ID).
+        """
+        keyed: List[Tuple[Match, Tuple[Source, int]]] = []
+        # Dict thay cho list để bỏ trùng O(1) mà vẫn giữ thứ tự xuất hiện
+        wanted: Dict[Source, Dict[int, None]] = {}
+        for match in self._iter_matches(results):
+            if not (key := self._match_key(match)): continue
+            keyed.append((match, key))
+            wanted.setdefault(key[0], {})[key[1]] = None
+
+        posts = await self._fetch_all(wanted)
+        for match, key in keyed:
+            if post := posts.get(key): match.post = post
+        return posts
+
+    async def fetch_posts(self, source: Source, post_ids: Iterable[int]) -> Dict[int, BooruPost]:
+        """Lấy metadata cho các post ID của một nguồn, ưu tiên dùng cache."""
+        if source not in self._states: raise ValueError(f"Nguồn không được hỗ trợ: {source}")
+        posts = await self._fetch_all({source: dict.fromkeys(post_ids)})
+        return {post_id: post for (_, post_id), post in posts.items()}
+
+    async def _fetch_all(self, wanted: Mapping[Source, Iterable[int]]) -> Dict[Tuple[Source, int], BooruPost]:
+        found: Dict[Tuple[Source, int], BooruPost] = {}
+        tasks = []
+        for source, ids in wanted.items():
+            missing = []
+            for post_id in ids:
+                if (post := self._cache.get((source, post_id))) is not None: found[(source, post_id)] = post
+                else: missing.append(post_id)
+            state = self._states[source]
+            size = max(1, state.site.batch_size)
+            tasks.extend(self._fetch_batch(state, missing[i:i + size]) for i in range(0, len(missing), size))
+
+        for batch in await asyncio.gather(*tasks):
+            for post in batch:
+                key = (post.source, post.post_id)
+                self._cache.set(key, post)
+                found[key] = post
+        return found
+
+    async def _fetch_batch(self, state: _SiteState, post_ids: List[int]) -> List[BooruPost]:
+        url, params = state.site.build_request(post_ids)
+        try:
+            await self._apply_rate_limit(state)
+            response = await state.client.get(url, params=params)
+            response.raise_for_status()
+            return state.site.parse_posts(response.json())
+        except (httpx.HTTPError, ValueError, KeyError, TypeError, AttributeError) as e:
+            # Payload lỗi của một lô không được làm hỏng cả lần enrich
+            if self._should_debug():
+                print(f"DEBUG: Không thể lấy metadata từ {state.site.source.value} cho {post_ids}. Lỗi: {e}")
+            return []
+
+    async def _apply_rate_limit(self, state: _SiteState):
+        async with state.rate_limit_lock:
+            sleep_for = state.site.rate_limit_seconds - (time.time() - state.last_request_time)
+            if sleep_for > 0: await asyncio.sleep(sleep_for)
+            state.last_request_time = time.time()
+
+    def _match_key(self, match: Match) -> Optional[Tuple[Source, int]]:
+        if match.source is None or (state := self._states.get(match.source)) is None: return None
+        if (post_id := state.site.parse_post_id(match.url)) is None: return None
+        return match.source, post_id
+
+    @staticmethod
+    def _iter_matches(results: Iterable[Union[SearchResult, Match]]) -> Iterable[Match]:
+        for item in results:
+            if isinstance(item, SearchResult): yield from item.matches
+            elif isinstance(item, Match): yield item
+            else: raise TypeError("Chỉ chấp nhận SearchResult hoặc Match.")
+
+    def _should_debug(self): return os.environ.get("IQDB_DEBUG") == "1"
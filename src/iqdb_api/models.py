@@ -1,8 +1,8 @@
 """
 Các data model cho response từ IQDB API.
 """
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 
 from .enums import *
 
@@ -26,6 +26,21 @@ class YourImage:
     size: Optional[str] = None
 
 
+@dataclass
+class BooruPost:
+    """Metadata đầy đủ của một post trên booru, lấy từ API của trang nguồn."""
+    source: Source
+    post_id: int
+    tags: List[str] = field(default_factory=list)
+    rating: Rating = Rating.UNRATED
+    score: Optional[int] = None
+    md5: Optional[str] = None
+    file_url: Optional[str] = None
+    source_url: Optional[str] = None
+    resolution: Optional[Resolution] = None
+    raw: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+
 @dataclass
 class Match:
     """Đại diện cho một kết quả tìm kiếm tương tự được tìm thấy."""
@@ -38,6 +53,7 @@ class Match:
     source: Optional[Source] = None
     resolution: Optional[Resolution] = None
     similarity: Optional[float] = None
+    post: Optional[BooruPost] = None
 
     @property
     def is_best_match(self) -> bool:
@@ -59,6 +75,7 @@ class SearchResult:
     matches: List[Match]
     your_image: Optional[YourImage] = None
     search_more_info: Optional[SearchMoreInfo] = None
+    services: Optional[List[Source]] = None
 
     @property
     def is_found(self) -> bool:
@@ -78,4 +95,23 @@ class SearchResult:
     @property
     def possible_matches(self) -> List[Match]:
         """Lấy danh sách các kết quả có thể (`possible match`)."""
-        return [match for match in self.matches if match.match_type == MatchType.POSSIBLE]
\ No newline at end of file
+        return [match for match in self.matches if match.match_type == MatchType.POSSIBLE]
+
+
+@dataclass
+class ServiceSearchStats:
+    """Thống kê chi phí tìm kiếm phía server cho một tập dịch vụ, lấy từ dòng "Searched N images in X seconds"."""
+    services: Tuple[Source, ...]  # Tuple rỗng: không chọn nguồn, server dùng mặc định
+    queries: int = 0
+    searched_images: int = 0
+    searched_seconds: float = 0.0
+
+    @property
+    def average_seconds(self) -> float:
+        """Thời gian tìm kiếm trung bình của server cho mỗi truy vấn."""
+        return self.searched_seconds / self.queries if self.queries else 0.0
+
+    @property
+    def average_images(self) -> float:
+        """Số ảnh trung bình server phải so sánh cho mỗi truy vấn."""
+        return self.searched_images / self.queries if self.queries else 0.0
@@ -0,0 +1,142 @@
+"""
+Transport httpx có thể ghi lại (record) và phát lại (replay) các request/response.
+
+Ở chế độ record, mọi trao đổi thật được lưu vào một file cassette gọn (JSON,
+nén gzip nếu đuôi file là `.gz`). Ở chế độ replay, response được phát lại từ
+cassette mà không cần mạng, có thể kèm độ trễ giả lập.
+
+Ví dụ:
+    transport = CassetteTransport("iqdb.json.gz", mode="replay", latency=0.2, clock=clock)
+    async with IqdbClient(transport=transport, clock=clock) as client: ...
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from .clock import Clock, SystemClock
+
+CASSETTE_VERSION = 1
+# Các header bị bỏ qua vì body đã được httpx giải nén và đọc hết khi ghi lại
+_SKIPPED_RESPONSE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+
+
+class CassetteMissException(httpx.TransportError):
+    """Exception khi không có response nào trong cassette khớp với request (chế độ replay)."""
+    pass
+
+
+def request_key(request: httpx.Request) -> str:
+    """
+    Khóa so khớp của một request: method, URL và hash của body.
+
+    Boundary của multipart được sinh ngẫu nhiên mỗi lần gửi nên được chuẩn hóa
+    trước khi hash, để upload cùng một file luôn cho cùng một khóa.
+    """
+    body = request.content
+    content_type = request.headers.get("content-type", "")
+    if "boundary=" in content_type:
+        boundary = content_type.split("boundary=", 1)[1].split(";", 1)[0].strip().strip('"')
+        if boundary: body = body.replace(boundary.encode(), b"BOUNDARY")
+    return f"{request.method} {request.url} {hashlib.sha1(body).hexdigest()}"
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """
+    Transport record/replay cho `httpx.AsyncClient`.
+
+    Các response cùng khóa được phát lại theo đúng thứ tự đã ghi (ví dụ lần đầu
+    "Can't read query result", lần sau thành công), rồi quay vòng lại từ đầu,
+    nên cùng một cassette có thể được phát lại nhiều lần với kết quả như nhau.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "replay",
+        latency: float = 0.0,
+        clock: Optional[Clock] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Args:
+            path (str): Đường dẫn file cassette.
+            mode (str): "record" (gọi mạng thật và ghi lại), "replay" (chỉ phát lại),
+                        hoặc "once" (phát lại nếu cassette đã tồn tại, nếu chưa thì ghi).
+            latency (float): Độ trễ giả lập (giây) cho mỗi response khi phát lại.
+            clock: Đồng hồ dùng cho độ trễ giả lập (mặc định: `SystemClock`).
+            transport (httpx.AsyncBaseTransport): Transport thật dùng khi ghi (mặc định: `httpx.AsyncHTTPTransport`).
+        """
+        if mode == "once": mode = "replay" if os.path.exists(path) else "record"
+        if mode not in ("record", "replay"): raise ValueError(f"Chế độ cassette không hợp lệ: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._clock = clock or SystemClock()
+        self._transport = transport
+        self._interactions: List[Dict[str, Any]] = []
+        self._queues: Dict[str, Tuple[List[Dict[str, Any]], Deque[Dict[str, Any]]]] = {}
+        if mode == "record":
+            self._transport = transport or httpx.AsyncHTTPTransport()
+        else:
+            self._load()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        key = request_key(request)
+        if self.mode == "record": return await self._record(request, key)
+
+        if (entry := self._queues.get(key)) is None:
+            raise CassetteMissException(f"Không có response nào trong cassette cho {request.method} {request.url}", request=request)
+        recorded, pending = entry
+        if not pending: pending.extend(recorded)
+        data = pending.popleft()
+        if self.latency > 0: await self._clock.sleep(self.latency)
+        return httpx.Response(data["status"], headers=data["headers"], content=self._decode_body(data), request=request)
+
+    async def aclose(self):
+        if self.mode == "record":
+            self.save()
+            await self._transport.aclose()
+
+    def save(self):
+        """Ghi cassette ra đĩa (được gọi tự động khi client đóng ở chế độ record)."""
+        payload = json.dumps({"version": CASSETTE_VERSION, "interactions": self._interactions}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if self.path.endswith(".gz"): payload = gzip.compress(payload)
+        with open(self.path, "wb") as f: f.write(payload)
+
+    async def _record(self, request: httpx.Request, key: str) -> httpx.Response:
+        response = await self._transport.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in _SKIPPED_RESPONSE_HEADERS]
+        self._interactions.append({"key": key, "status": response.status_code, "headers": headers, **self._encode_body(content)})
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    def _load(self):
+        with open(self.path, "rb") as f: payload = f.read()
+        if self.path.endswith(".gz"): payload = gzip.decompress(payload)
+        data = json.loads(payload.decode("utf-8"))
+        if data.get("version") != CASSETTE_VERSION: raise ValueError(f"Phiên bản cassette không được hỗ trợ: {data.get('version')}")
+        for interaction in data["interactions"]:
+            self._queues.setdefault(interaction["key"], ([], deque()))[0].append(interaction)
+        for recorded, pending in self._queues.values(): pending.extend(recorded)
+
+    @staticmethod
+    def _encode_body(content: bytes) -> Dict[str, str]:
+        try:
+            return {"body": content.decode("utf-8")}
+        except UnicodeDecodeError:
+            return {"body_b64": base64.b64encode(content).decode("ascii")}
+
+    @staticmethod
+    def _decode_body(data: Dict[str, Any]) -> bytes:
+        if "body_b64" in data: return base64.b64decode(data["body_b64"])
+        return data.get("body", "").encode("utf-8")
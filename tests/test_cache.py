@@ -0,0 +1,76 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from iqdb_api import IqdbClient, LRUByteCache, Match, MatchType, VirtualClock
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.calls = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.calls.append(fn.__name__)
+        return super().submit(fn, *args, **kwargs)
+
+
+async def test_async_disk_tier_runs_in_executor(tmp_path):
+    cache = LRUByteCache(max_bytes=4, disk_dir=tmp_path, disk_max_bytes=10)
+    with RecordingExecutor() as executor:
+        await cache.aset("a", b"12345", executor)
+        await cache.aset("b", b"67890", executor)
+        assert executor.calls == ["_write_file", "_write_file"]
+
+        assert await cache.aget("a", executor) == b"12345"
+        assert executor.calls[-1] == "_read_file"
+
+        await cache.aset("c", b"abcde", executor)
+        assert executor.calls[-2:] == ["_write_file", "_remove_files"]
+
+    assert cache.disk_bytes == 10
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(f"{LRUByteCache._disk_name(k)}.bin" for k in ("a", "c"))
+    assert "b" not in cache
+
+
+async def test_async_memory_hit_does_not_touch_executor(tmp_path):
+    cache = LRUByteCache(disk_dir=tmp_path)
+    with RecordingExecutor() as executor:
+        await cache.aset("a", b"data", executor)
+        assert await cache.aget("a", executor) == b"data"
+        assert await cache.aget("missing", executor) is None
+        assert executor.calls == ["_write_file"]
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    LRUByteCache(disk_dir=tmp_path).set("a", b"data")
+
+    cache = LRUByteCache(disk_dir=tmp_path)
+    assert len(cache) == 0 and "a" in cache
+    assert cache.get("a") == b"data"
+    assert len(cache) == 1
+
+
+async def test_fetch_previews_reads_disk_cache_off_the_event_loop(tmp_path):
+    url = "https://iqdb.test/danbooru/1.jpg"
+    requests, read_threads = [], []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, content=b"thumbnail")
+
+    def make_client():
+        return IqdbClient(transport=httpx.MockTransport(handler), clock=VirtualClock(), preview_cache=LRUByteCache(disk_dir=tmp_path))
+
+    match = Match(MatchType.BEST, "https://danbooru.donmai.us/posts/1", preview_url=url)
+    async with make_client() as client:
+        assert await client.fetch_previews([match]) == {url: b"thumbnail"}
+
+    async with make_client() as client:
+        read_file = client._preview_cache._read_file
+        client._preview_cache._read_file = lambda name: read_threads.append(threading.current_thread()) or read_file(name)
+        assert await client.fetch_previews([match, match]) == {url: b"thumbnail"}
+
+    assert len(requests) == 1
+    assert read_threads and threading.main_thread() not in read_threads
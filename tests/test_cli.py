@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from PIL import Image
+
+from iqdb_api import cli
+
+
+def write_lines(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_load_completed_skips_unparsable_lines(tmp_path):
+    output = write_lines(tmp_path / "out.ndjson", '{"input": "a", "status": "ok"}\n{"input":"b","sta\n{"input": "c", "status": "ok"}\n{"input": "d", "status": "error"}\n')
+    assert cli.load_completed(output, "ndjson") == {"a", "c"}
+
+
+def test_truncate_partial_line_removes_trailing_fragment(tmp_path):
+    output = write_lines(tmp_path / "out.ndjson", '{"input": "a", "status": "ok"}\n{"input":"b","sta')
+    cli.truncate_partial_line(output)
+    assert (tmp_path / "out.ndjson").read_text(encoding="utf-8") == '{"input": "a", "status": "ok"}\n'
+
+
+def test_truncate_partial_line_keeps_complete_file(tmp_path):
+    content = '{"input": "a", "status": "ok"}\n'
+    output = write_lines(tmp_path / "out.ndjson", content)
+    cli.truncate_partial_line(output)
+    assert (tmp_path / "out.ndjson").read_text(encoding="utf-8") == content
+
+
+def test_resume_after_interrupted_run_appends_clean_records(tmp_path):
+    image = tmp_path / "images" / "x.png"
+    image.parent.mkdir()
+    Image.new("RGB", (8, 8)).save(image)
+    output = write_lines(tmp_path / "out.ndjson", '{"input": "a", "status": "ok"}\n{"input":"b","sta')
+
+    cli.main([str(image.parent), "-o", output, "--resume", "--base-url", "http://127.0.0.1:1", "--rate-limit", "0", "--no-prevent-bans"])
+
+    lines = (tmp_path / "out.ndjson").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["input"] for line in lines] == ["a", str(image)]
+
+
+def test_http_errors_are_recorded_per_input_without_hanging(tmp_path):
+    images = tmp_path / "images"
+    images.mkdir()
+    for i in range(12):
+        Image.new("RGB", (8, 8), (i * 20, 0, 0)).save(images / f"{i}.png")
+    output = str(tmp_path / "out.ndjson")
+
+    code = cli.main([str(images), "-o", output, "-j", "1", "--base-url", "http://127.0.0.1:1", "--rate-limit", "0", "--no-prevent-bans", "--max-retries", "0"])
+
+    records = [json.loads(line) for line in open(output, encoding="utf-8")]
+    assert code == 1
+    assert len(records) == 12
+    assert all(r["status"] == "error" for r in records)
+
+
+async def test_cancelling_run_stops_in_flight_url_searches(tmp_path):
+    async def never_respond(reader, writer):
+        await asyncio.Event().wait()
+
+    server = await asyncio.start_server(never_respond, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    output = tmp_path / "out.ndjson"
+    args = cli.build_parser().parse_args(["https://x/a.jpg", "https://x/b.jpg", "-o", str(output), "--base-url", f"http://127.0.0.1:{port}", "--rate-limit", "0", "--no-prevent-bans", "--timeout", "60"])
+
+    async with server:
+        task = asyncio.ensure_future(cli._run(args))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        done, _ = await asyncio.wait([task], timeout=3)
+
+    assert task in done and task.cancelled()
+    assert output.read_text(encoding="utf-8") == ""
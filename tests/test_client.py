@@ -0,0 +1,64 @@
+from io import BytesIO
+from pathlib import Path
+
+import httpx
+from PIL import Image
+
+from iqdb_api import Iqdb3dClient, IqdbClient, Source, VirtualClock
+
+RESULT_HTML = (Path(__file__).parent / "fixtures" / "iqdb_result.html").read_text(encoding="utf-8")
+
+
+def make_image() -> bytes:
+    with BytesIO() as out:
+        Image.new("RGB", (16, 16), (200, 100, 50)).save(out, format="PNG")
+        return out.getvalue()
+
+
+IMAGE = make_image()
+
+
+def make_client(handler, client_class=IqdbClient, **kwargs):
+    return client_class(base_url="https://iqdb.test", transport=httpx.MockTransport(handler), clock=VirtualClock(), **kwargs)
+
+
+async def test_stats_key_does_not_depend_on_service_order():
+    async with make_client(lambda request: httpx.Response(200, html=RESULT_HTML)) as client:
+        first = await client.search_file(IMAGE, services=[Source.GELBOORU, Source.DANBOORU])
+        await client.search_file(IMAGE, services=[Source.DANBOORU, Source.GELBOORU, Source.DANBOORU])
+
+    assert first.services == [Source.DANBOORU, Source.GELBOORU]
+    assert list(client.search_stats) == [(Source.DANBOORU, Source.GELBOORU)]
+    assert client.search_stats[(Source.DANBOORU, Source.GELBOORU)].queries == 2
+
+
+async def test_more_page_is_not_counted_twice():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, html=RESULT_HTML.replace("2.516", "9.000") if "more" in request.url.params else RESULT_HTML)
+
+    async with make_client(handler, include_more_results=True) as client:
+        await client.search_file(IMAGE)
+
+    assert len(requests) == 2
+    stats = client.search_stats[tuple(IqdbClient.SERVICE_IDS)]
+    assert (stats.queries, stats.searched_images, stats.searched_seconds) == (1, 14789123, 2.516)
+
+
+async def test_3d_default_search_uses_server_default_key():
+    bodies = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(request.read())
+        return httpx.Response(200, html=RESULT_HTML)
+
+    async with make_client(handler, Iqdb3dClient) as client:
+        result = await client.search_file(IMAGE)
+        selected = await client.search_file(IMAGE, services=[Source.IDOL_COMPLEX, Source.THREEBOORU])
+
+    assert b'name="service[]"' not in bodies[0] and b'name="service"' not in bodies[0]
+    assert result.services is None
+    assert selected.services == [Source.THREEBOORU, Source.IDOL_COMPLEX]
+    assert set(client.search_stats) == {(), (Source.THREEBOORU, Source.IDOL_COMPLEX)}
@@ -0,0 +1,139 @@
+import json
+from typing import Any, Dict, List, Sequence, Tuple
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+from iqdb_api import BooruEnricher, BooruPost, BooruSite, DanbooruSite, GelbooruSite, Match, MatchType, Rating, SearchResult, Source, YandereSite
+
+
+def make_enricher(handler, **kwargs):
+    sites = [DanbooruSite(rate_limit_seconds=0), GelbooruSite(rate_limit_seconds=0), YandereSite(rate_limit_seconds=0)]
+    return BooruEnricher(sites=sites, transport=httpx.MockTransport(handler), **kwargs)
+
+
+def danbooru_match(post_id):
+    return Match(MatchType.BEST, f"https://danbooru.donmai.us/posts/{post_id}", source=Source.DANBOORU)
+
+
+def danbooru_handler(requests):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        ids = parse_qs(request.url.query.decode())["tags"][0][len("id:"):].split(",")
+        posts = [{"id": int(i), "tag_string": "a b", "rating": "e", "score": 1, "image_width": 10, "image_height": 20} for i in ids]
+        return httpx.Response(200, json=posts)
+    return handler
+
+
+async def test_danbooru_ids_are_fetched_in_batches():
+    requests = []
+    matches = [danbooru_match(i) for i in range(1, 251)]
+    async with make_enricher(danbooru_handler(requests)) as enricher:
+        posts = await enricher.enrich([SearchResult(0, 0.0, matches)])
+
+    assert len(posts) == 250
+    assert len(requests) == 3  # batch_size = 100
+    assert all(m.post is not None and m.post.post_id == int(m.url.rsplit("/", 1)[1]) for m in matches)
+    assert matches[0].post.rating == Rating.EXPLICIT
+    assert matches[0].post.resolution.width == 10
+
+
+async def test_duplicate_ids_are_requested_once():
+    requests = []
+    async with make_enricher(danbooru_handler(requests)) as enricher:
+        await enricher.enrich([danbooru_match(7), danbooru_match(7), danbooru_match(8)])
+
+    assert len(requests) == 1
+    assert parse_qs(requests[0].url.query.decode())["tags"] == ["id:7,8"]
+
+
+async def test_many_duplicate_ids_keep_first_seen_order():
+    requests = []
+    matches = [danbooru_match(i % 150 + 1) for i in range(30000)]
+    async with make_enricher(danbooru_handler(requests)) as enricher:
+        await enricher.enrich(matches)
+
+    ids = [int(i) for r in requests for i in parse_qs(r.url.query.decode())["tags"][0][len("id:"):].split(",")]
+    assert ids == list(range(1, 151))
+    assert all(m.post is not None for m in matches)
+
+
+async def test_second_enrich_is_served_from_cache():
+    requests = []
+    async with make_enricher(danbooru_handler(requests)) as enricher:
+        await enricher.enrich([danbooru_match(1), danbooru_match(2)])
+        again = [danbooru_match(1), danbooru_match(2)]
+        await enricher.enrich(again)
+
+    assert len(requests) == 1
+    assert [m.post.post_id for m in again] == [1, 2]
+
+
+async def test_expired_cache_entries_are_refetched():
+    requests = []
+    async with make_enricher(danbooru_handler(requests), cache_ttl_seconds=-1) as enricher:
+        await enricher.enrich([danbooru_match(1)])
+        await enricher.enrich([danbooru_match(1)])
+
+    assert len(requests) == 2
+
+
+async def test_failing_site_does_not_break_other_sites():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "gelbooru.com":
+            return httpx.Response(503)
+        if request.url.host == "yande.re":
+            return httpx.Response(200, json=[{"id": None, "tags": "x"}])
+        return danbooru_handler([])(request)
+
+    gelbooru = Match(MatchType.BEST, "https://gelbooru.com/index.php?page=post&s=view&id=5", source=Source.GELBOORU)
+    yandere = Match(MatchType.BEST, "https://yande.re/post/show/9", source=Source.YANDERE)
+    danbooru = danbooru_match(3)
+    async with make_enricher(handler) as enricher:
+        posts = await enricher.enrich([gelbooru, yandere, danbooru])
+
+    assert list(posts) == [(Source.DANBOORU, 3)]
+    assert danbooru.post is not None
+    assert gelbooru.post is None and yandere.post is None
+
+
+async def test_gelbooru_uses_or_query_for_multiple_ids():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, content=json.dumps({"post": [{"id": 5, "tags": "x", "rating": "general"}, {"id": 6, "tags": "y", "rating": "explicit"}]}))
+
+    matches = [Match(MatchType.BEST, f"https://gelbooru.com/index.php?page=post&s=view&id={i}", source=Source.GELBOORU) for i in (5, 6)]
+    async with make_enricher(handler) as enricher:
+        await enricher.enrich(matches)
+
+    assert len(requests) == 1
+    assert parse_qs(requests[0].url.query.decode())["tags"] == ["{id:5 ~ id:6}"]
+    assert [m.post.rating for m in matches] == [Rating.SAFE, Rating.EXPLICIT]
+
+
+def test_sensitive_rating_is_consistent_across_sites():
+    danbooru = DanbooruSite().parse_posts([{"id": 1, "tag_string": "", "rating": r} for r in ("g", "s", "q", "e")])
+    gelbooru = GelbooruSite().parse_posts({"post": [{"id": 1, "tags": "", "rating": r} for r in ("general", "sensitive", "questionable", "explicit")]})
+
+    assert [p.rating for p in danbooru] == [p.rating for p in gelbooru] == [Rating.SAFE, Rating.QUESTIONABLE, Rating.QUESTIONABLE, Rating.EXPLICIT]
+
+
+def test_incomplete_site_adapter_fails_on_instantiation():
+    class IncompleteSite(BooruSite):
+        source = Source.ZEROCHAN
+        default_base_url = "https://zerochan.test"
+
+        def build_request(self, post_ids: Sequence[int]) -> Tuple[str, Dict[str, str]]:
+            return f"{self.base_url}/posts", {}
+
+    with pytest.raises(TypeError):
+        IncompleteSite()
+
+    class CompleteSite(IncompleteSite):
+        def parse_posts(self, payload: Any) -> List[BooruPost]:
+            return []
+
+    assert CompleteSite().base_url == "https://zerochan.test"
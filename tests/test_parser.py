@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import pytest
+
+from iqdb_api import MatchType, Rating, Source
+from iqdb_api.classifier import MatchTextClassifier
+from iqdb_api.exceptions import ImageTooLargeException, ReadQueryResultException
+from iqdb_api.models import Resolution
+from iqdb_api.parser import SearchResultParser
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def load_fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def test_parse_result_page():
+    result = SearchResultParser().parse_result(load_fixture("iqdb_result.html"))
+
+    assert result.searched_images_count == 14789123
+    assert result.searched_in_seconds == 2.516
+    assert result.search_more_info.href == "/?more=1&org=9d6b3f1a"
+    assert result.your_image.name == "sample.jpg"
+    assert result.your_image.resolution == Resolution(500, 500)
+    assert result.your_image.preview_url == "https://iqdb.org/thu/thu_9d6b3f1a.jpg"
+
+    assert [m.match_type for m in result.matches] == [MatchType.BEST, MatchType.ADDITIONAL, MatchType.POSSIBLE, MatchType.POSSIBLE]
+    best, additional, possible, more = result.matches
+    assert best.url == "https://danbooru.donmai.us/posts/5012345"
+    assert (best.source, best.rating, best.similarity, best.resolution) == (Source.DANBOORU, Rating.SAFE, 95.0, Resolution(1200, 900))
+    assert best.score == 42 and best.tags == ["1girl", "long_hair", "smile", "solo"]
+    assert (additional.source, additional.rating, additional.similarity) == (Source.GELBOORU, Rating.EXPLICIT, 93.0)
+    assert (possible.source, possible.rating) == (Source.KONACHAN, Rating.QUESTIONABLE)
+    assert more.url == "https://www.zerochan.net/3012345" and more.source == Source.ZEROCHAN
+
+
+def test_parse_no_relevant_matches_page():
+    result = SearchResultParser().parse_result(load_fixture("iqdb_no_relevant.html"))
+
+    assert not result.is_found
+    assert result.search_more_info is None
+    assert [(m.source, m.similarity) for m in result.matches] == [(Source.ESHUUSHUU, 44.0)]
+
+
+@pytest.mark.parametrize("name, exception", [
+    ("iqdb_retry.html", ReadQueryResultException),
+    ("iqdb_too_large.html", ImageTooLargeException),
+])
+def test_parse_error_pages(name, exception):
+    with pytest.raises(exception):
+        SearchResultParser().parse_result(load_fixture(name))
+
+
+def test_classify_prefers_registration_order_and_safest_rating():
+    info = MatchTextClassifier().classify("Gelbooru Danbooru 1200×900 [Explicit] [Safe] 95% similarity")
+
+    assert (info.source, info.rating) == (Source.DANBOORU, Rating.SAFE)
+    assert info.similarity == 95.0 and info.resolution == Resolution(1200, 900)
+
+
+def test_classify_without_markers():
+    assert MatchTextClassifier().classify("no markers here") == (None, Rating.UNRATED, None, None)
+
+
+def test_register_source_recompiles_pattern():
+    classifier = MatchTextClassifier()
+    assert classifier.classify("Sankaku Idol [Safe]").source is None
+    pattern = classifier._get_pattern()
+
+    classifier.register_source("Sankaku Idol", Source.IDOL_COMPLEX)
+
+    assert classifier._get_pattern() is not pattern
+    assert classifier.classify("Sankaku Idol [Safe]").source == Source.IDOL_COMPLEX
+    assert MatchTextClassifier().classify("Sankaku Idol [Safe]").source is None
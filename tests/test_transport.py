@@ -0,0 +1,88 @@
+import time
+from io import BytesIO
+from pathlib import Path
+
+import httpx
+import pytest
+from PIL import Image
+
+from iqdb_api import CassetteMissException, CassetteTransport, IqdbClient, VirtualClock
+from iqdb_api.transport import request_key
+
+FIXTURES = Path(__file__).parent / "fixtures"
+RESULT_HTML = (FIXTURES / "iqdb_result.html").read_text(encoding="utf-8")
+RETRY_HTML = (FIXTURES / "iqdb_retry.html").read_text(encoding="utf-8")
+
+
+def make_image() -> bytes:
+    with BytesIO() as out:
+        Image.new("RGB", (16, 16), (10, 20, 30)).save(out, format="PNG")
+        return out.getvalue()
+
+
+async def record(path, handler, requests):
+    transport = CassetteTransport(str(path), mode="record", transport=httpx.MockTransport(handler))
+    async with httpx.AsyncClient(transport=transport) as client:
+        for method, url in requests: await client.request(method, url)
+
+
+async def test_replay_returns_responses_in_recorded_order_then_cycles(tmp_path):
+    path = tmp_path / "cassette.json.gz"
+    bodies = iter(["first", "second", "third"])
+    await record(path, lambda request: httpx.Response(200, text=next(bodies)), [("GET", "https://iqdb.test/")] * 3)
+
+    async with httpx.AsyncClient(transport=CassetteTransport(str(path))) as client:
+        replayed = [(await client.get("https://iqdb.test/")).text for _ in range(5)]
+
+    assert replayed == ["first", "second", "third", "first", "second"]
+
+
+async def test_client_replays_retry_sequence(tmp_path):
+    path = tmp_path / "cassette.json"
+    image = make_image()
+    responses = iter([RETRY_HTML, RESULT_HTML])
+
+    transport = CassetteTransport(str(path), mode="record", transport=httpx.MockTransport(lambda request: httpx.Response(200, html=next(responses))))
+    async with IqdbClient(base_url="https://iqdb.test", transport=transport, clock=VirtualClock()) as client:
+        recorded = await client.search_file(image)
+
+    clock = VirtualClock()
+    async with IqdbClient(base_url="https://iqdb.test", transport=CassetteTransport(str(path)), clock=clock, retry_delay=2.0) as client:
+        for _ in range(2):
+            before = clock.time()
+            result = await client.search_file(image)
+            # Mỗi lần phát lại đều gặp lại lỗi "Can't read query result" trước khi thành công
+            assert clock.time() - before >= 2.0
+            assert result.matches == recorded.matches
+
+
+def test_request_key_normalizes_multipart_boundary():
+    first = httpx.Request("POST", "https://iqdb.test/", files={"file": ("a.png", b"data")}, data={"url": ""})
+    second = httpx.Request("POST", "https://iqdb.test/", files={"file": ("a.png", b"data")}, data={"url": ""})
+    other = httpx.Request("POST", "https://iqdb.test/", files={"file": ("a.png", b"other")}, data={"url": ""})
+    for request in (first, second, other): request.read()
+
+    assert first.headers["content-type"] != second.headers["content-type"]
+    assert request_key(first) == request_key(second)
+    assert request_key(first) != request_key(other)
+
+
+async def test_replay_raises_on_unknown_request(tmp_path):
+    path = tmp_path / "cassette.json"
+    await record(path, lambda request: httpx.Response(200, text="ok"), [("GET", "https://iqdb.test/")])
+
+    async with httpx.AsyncClient(transport=CassetteTransport(str(path))) as client:
+        with pytest.raises(CassetteMissException):
+            await client.get("https://iqdb.test/?more=1")
+
+
+async def test_virtual_clock_rate_limit_does_not_sleep():
+    clock = VirtualClock()
+    client = IqdbClient(rate_limit_seconds=30.0, clock=clock)
+    start = time.perf_counter()
+    for _ in range(3): await client._apply_rate_limit()
+    elapsed = time.perf_counter() - start
+    await client.close()
+
+    assert clock.time() >= 90.0
+    assert elapsed < 1.0